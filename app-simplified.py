@@ -3,11 +3,18 @@ import numpy as np
 from pyzbar import pyzbar
 from pylibdmtx import pylibdmtx
 import base64
+import io
 import os
 import time
 import requests
 import uuid
+import hashlib
+import orjson
+import threading
 from urllib.parse import urlparse
+from http.cookiejar import DefaultCookiePolicy
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
 from flask import Flask, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 
@@ -21,114 +28,377 @@ for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
         os.makedirs(folder)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-def detect_datamatrix(image):
+# Shared pool for running the decoders concurrently (both release the GIL
+# inside their native library calls)
+decode_pool = ThreadPoolExecutor(max_workers=4)
+
+# Pool for writing result images to disk while the JSON response is built
+io_pool = ThreadPoolExecutor(max_workers=4)
+
+# Prefer libjpeg-turbo via PyTurboJPEG for inline JPEG responses, falling back
+# to OpenCV when the library is not available
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    jpeg_encoder = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    jpeg_encoder = None
+
+JPEG_QUALITY = 85
+
+def encode_jpeg(image):
     """
-    Detect Data Matrix codes using both pyzbar and pylibdmtx libraries
+    Encode a BGR image as JPEG bytes
     """
-    results = []
+    if jpeg_encoder is not None:
+        return jpeg_encoder.encode(image, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
+    
+    _, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    return buffer
+
+# Recently produced result images kept as encoded JPEG bytes so /download can
+# serve them without touching the disk; bounded by total size in bytes. Each
+# gunicorn worker has its own cache, so every result must get a unique filename
+# that is never rewritten
+RESULT_IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+result_image_cache = LRUCache(maxsize=RESULT_IMAGE_CACHE_BYTES, getsizeof=len)
+result_image_cache_lock = threading.Lock()
+
+def save_result_image(filename, image):
+    """
+    Encode a result image once, keep it in memory for downloads and write it to disk
+    """
+    filepath = os.path.join(OUTPUT_FOLDER, filename)
+    
+    # Other formats keep OpenCV's extension-based encoding and are served from disk
+    if not filename.lower().endswith(('.jpg', '.jpeg')):
+        cv2.imwrite(filepath, image)
+        return
+    
+    jpeg_bytes = bytes(encode_jpeg(image))
+    with result_image_cache_lock:
+        result_image_cache[filename] = jpeg_bytes
+    
+    with open(filepath, 'wb') as f:
+        f.write(jpeg_bytes)
+
+# Cache of decode results keyed by a hash of the grayscale pixels, so repeated
+# uploads of the same image skip decoding entirely
+DECODE_CACHE_SIZE = 1024
+decode_cache = LRUCache(maxsize=DECODE_CACHE_SIZE)
+decode_cache_lock = threading.Lock()
+
+def image_cache_key(gray):
+    """
+    Hash the image dimensions and pixels into a compact cache key
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(gray.shape).encode())
+    digest.update(np.ascontiguousarray(gray))
+    return digest.digest()
+
+# Per-thread scratch buffers reused across requests to avoid reallocating
+# full-size images every time
+scratch = threading.local()
+
+def scratch_buffer(name, shape):
+    """
+    Return this thread's uint8 buffer for name, reallocating only when the shape changes
+    """
+    buffer = getattr(scratch, name, None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        setattr(scratch, name, buffer)
+    return buffer
+
+# Longest image edge passed to pylibdmtx; its region search grows
+# super-linearly with image area
+PYLIBDMTX_MAX_DIMENSION = 1600
+
+# Huge scans whose downscaled decode finds nothing are retried at full
+# resolution in overlapping tiles decoded in parallel
+TILED_DECODE_MIN_DIMENSION = 2000
+TILE_SIZE = 1024
+TILE_OVERLAP = 128
+
+# Tiles of one image are decoded by a short-lived pool of at most this many
+# threads owned by the request, so a large image never queues behind (or
+# ahead of) another request's tiles. The worst case is workers x threads x
+# TILE_FANOUT pylibdmtx threads, only while requests hit this fallback
+TILE_FANOUT = int(os.environ.get('TILE_FANOUT', 4))
+
+def tile_offsets(length, tile, overlap):
+    """
+    Start offsets of overlapping windows covering [0, length)
+    """
+    if length <= tile:
+        return [0]
+    stride = tile - overlap
+    offsets = list(range(0, length - tile, stride))
+    offsets.append(length - tile)
+    return offsets
+
+def rect_iou(a, b):
+    """
+    Intersection over union of two (left, top, width, height) rects
+    """
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+def decode_pylibdmtx_tiled(gray, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Decode overlapping tiles with pylibdmtx in parallel and merge the
+    results into full-image coordinates
+    """
+    h, w = gray.shape[:2]
+    tiles = [
+        (x0, y0, gray[y0:y0 + tile, x0:x0 + tile])
+        for y0 in tile_offsets(h, tile, overlap)
+        for x0 in tile_offsets(w, tile, overlap)
+    ]
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(TILE_FANOUT, len(tiles)))) as tile_pool:
+        tile_codes = list(tile_pool.map(pylibdmtx.decode, [tile_img for _, _, tile_img in tiles]))
+    
+    merged = []
+    for (x0, y0, tile_img), codes in zip(tiles, tile_codes):
+        tile_h = tile_img.shape[0]
+        for code in codes:
+            left, top, width, height = code.rect
+            # pylibdmtx measures rect.top from the bottom edge of the image
+            rect = type(code.rect)(left + x0, top + (h - y0 - tile_h), width, height)
+            
+            # Codes in the overlap band are found by more than one tile
+            if any(other.data == code.data and rect_iou(other.rect, rect) > 0.5 for other in merged):
+                continue
+            merged.append(code._replace(rect=rect))
+    
+    return merged
+
+def decode_pylibdmtx_downscaled(gray):
+    """
+    Run pylibdmtx on a downscaled copy of large images and map the
+    returned rects back to full-resolution coordinates
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, PYLIBDMTX_MAX_DIMENSION / max(h, w))
+    if scale >= 1.0:
+        return pylibdmtx.decode(gray)
+    
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    codes = pylibdmtx.decode(small)
+    
+    # Small codes may not survive downscaling on huge scans
+    if not codes and max(h, w) > TILED_DECODE_MIN_DIMENSION:
+        return decode_pylibdmtx_tiled(gray)
+    
+    # Scale rect coordinates back to the original image
+    return [
+        code._replace(rect=type(code.rect)(*(int(round(v / scale)) for v in code.rect)))
+        for code in codes
+    ]
+
+# pylibdmtx is skipped when pyzbar's results cover at least this fraction of
+# the image. zbar cannot decode Data Matrix, so this is purely a coverage
+# heuristic: a single QR code or barcode this large hides any Data Matrix
+# codes elsewhere in the frame, which is why the skip only applies with fast
+PYZBAR_COVERAGE_SKIP_RATIO = 0.5
+
+def pyzbar_covers_image(codes, shape):
+    """
+    Check whether pyzbar results make a pylibdmtx pass unnecessary
+    """
+    if not codes:
+        return False
+    
+    # Union area of the pyzbar bounding boxes
+    mask = np.zeros(shape[:2], dtype=bool)
+    for code in codes:
+        left, top, width, height = code.rect
+        mask[max(top, 0):top + height, max(left, 0):left + width] = True
+    return mask.mean() >= PYZBAR_COVERAGE_SKIP_RATIO
+
+def polygon_to_array(polygon):
+    """
+    Convert pyzbar polygon points to an (N, 2) int32 array in a single allocation
+    """
+    return np.fromiter(
+        (v for p in polygon for v in (p.x, p.y)), dtype=np.int32, count=2 * len(polygon)
+    ).reshape(-1, 2)
+
+# Columnar layout for detections: one structured array holds the geometry of
+# every code, polygon points live in a single (N, 2) buffer, and JSON dicts
+# are only built at the response boundary
+DETECTION_DTYPE = np.dtype([
+    ('x', 'i4'),
+    ('y', 'i4'),
+    ('width', 'i4'),
+    ('height', 'i4'),
+    ('method', 'u1'),
+    ('n_poly', 'i4')
+])
+DETECTION_METHODS = ['pyzbar', 'pylibdmtx']
+DETECTION_COLORS = [(0, 255, 0), (255, 0, 0)]
+
+def detect_datamatrix(image, fast=False):
+    """
+    Detect Data Matrix codes using both pyzbar and pylibdmtx libraries. Only
+    when fast is set is pylibdmtx skipped because pyzbar's results already
+    cover the image.
+    """
+    rows = []
+    polygons = []
+    data = []
+    types = []
+    
+    # Single grayscale conversion shared by both decoders
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=scratch_buffer('gray', image.shape[:2]))
     
-    # Try pyzbar first
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    pyzbar_codes = pyzbar.decode(image_rgb)
+    # Return cached detections for images that were already decoded
+    key = (image_cache_key(gray), fast)
+    with decode_cache_lock:
+        cached = decode_cache.get(key)
+    if cached is not None:
+        return cached
     
-    # Then try pylibdmtx
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    pylibdmtx_codes = pylibdmtx.decode(gray)
+    if fast:
+        # Run pyzbar first and only fall back to pylibdmtx when its results
+        # leave most of the image uncovered
+        pyzbar_codes = pyzbar.decode(gray)
+        if pyzbar_covers_image(pyzbar_codes, gray.shape):
+            pylibdmtx_codes = []
+        else:
+            pylibdmtx_codes = decode_pylibdmtx_downscaled(gray)
+    else:
+        # Run pyzbar and pylibdmtx in parallel
+        pyzbar_future = decode_pool.submit(pyzbar.decode, gray)
+        pylibdmtx_future = decode_pool.submit(decode_pylibdmtx_downscaled, gray)
+        pyzbar_codes = pyzbar_future.result()
+        pylibdmtx_codes = pylibdmtx_future.result()
     
     # Process pyzbar results
     for code in pyzbar_codes:
         try:
-            data = code.data.decode('utf-8')
-            code_type = code.type
-            
-            # Get position information
-            rect = code.rect
-            position = {
-                'x': int(rect.left),
-                'y': int(rect.top),
-                'width': int(rect.width),
-                'height': int(rect.height)
-            }
+            decoded = code.data.decode('utf-8')
             
             # Add polygon points if available
-            if hasattr(code, 'polygon') and code.polygon:
-                polygon = [(int(p.x), int(p.y)) for p in code.polygon]
-                position['polygon'] = polygon
-                
-            results.append({
-                'method': 'pyzbar',
-                'data': data,
-                'type': code_type,
-                'position': position
-            })
+            polygon = polygon_to_array(code.polygon) if code.polygon else None
+            
+            left, top, width, height = code.rect
+            rows.append((left, top, width, height, 0, 0 if polygon is None else len(polygon)))
+            if polygon is not None:
+                polygons.append(polygon)
+            data.append(decoded)
+            types.append(code.type)
         except Exception as e:
             print(f"Error processing pyzbar code: {e}")
     
     # Process pylibdmtx results
     for code in pylibdmtx_codes:
         try:
-            data = code.data.decode('utf-8')
+            decoded = code.data.decode('utf-8')
             
-            # Get position information if available
-            if hasattr(code, 'rect'):
-                left, top, width, height = code.rect
-                position = {
-                    'x': int(left),
-                    'y': int(top),
-                    'width': int(width),
-                    'height': int(height)
-                }
-            else:
-                position = None
-                
-            results.append({
-                'method': 'pylibdmtx',
-                'data': data,
-                'type': 'DATAMATRIX',
-                'position': position
-            })
+            left, top, width, height = code.rect
+            rows.append((left, top, width, height, 1, 0))
+            data.append(decoded)
+            types.append('DATAMATRIX')
         except Exception as e:
             print(f"Error processing pylibdmtx code: {e}")
     
+    detections = {
+        'geometry': np.array(rows, dtype=DETECTION_DTYPE),
+        'polygons': np.concatenate(polygons) if polygons else np.empty((0, 2), dtype=np.int32),
+        'data': data,
+        'types': types
+    }
+    
+    with decode_cache_lock:
+        decode_cache[key] = detections
+    
+    return detections
+
+def detections_to_json(detections):
+    """
+    Convert columnar detections into the list of dicts returned by the API
+    """
+    geometry = detections['geometry']
+    polygons = detections['polygons']
+    
+    results = []
+    offset = 0
+    for i, (x, y, w, h, method, n_poly) in enumerate(geometry.tolist()):
+        position = {
+            'x': x,
+            'y': y,
+            'width': w,
+            'height': h
+        }
+        if n_poly:
+            position['polygon'] = polygons[offset:offset + n_poly]
+            offset += n_poly
+        
+        results.append({
+            'method': DETECTION_METHODS[method],
+            'data': detections['data'][i],
+            'type': detections['types'][i],
+            'position': position
+        })
+    
     return results
 
-def highlight_codes(image, detected_codes):
+def highlight_codes(image, detections):
     """
     Draw rectangles around detected codes
     """
     result_image = image.copy()
+    polygons = detections['polygons']
+    
+    # Polygons are collected per method and drawn with one call per color
+    method_polygons = [[] for _ in DETECTION_METHODS]
     
-    for i, code in enumerate(detected_codes):
+    offset = 0
+    for i, (x, y, w, h, method, n_poly) in enumerate(detections['geometry'].tolist()):
+        start, offset = offset, offset + n_poly
         try:
-            position = code.get('position')
-            if not position:
-                continue
-                
-            # Draw rectangle
-            x = position.get('x', 0)
-            y = position.get('y', 0)
-            w = position.get('width', 0)
-            h = position.get('height', 0)
-            
             # Use different colors for different methods
-            color = (0, 255, 0) if code.get('method') == 'pyzbar' else (255, 0, 0)
+            color = DETECTION_COLORS[method]
+            
+            # Draw rectangle
             cv2.rectangle(result_image, (x, y), (x + w, y + h), color, 2)
             
             # Add text label
-            text = f"{i+1}: {code.get('data', '')}"
+            text = f"{i+1}: {detections['data'][i]}"
             cv2.putText(result_image, text, (x, max(y - 10, 15)), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
-            # Draw polygon if available
-            if 'polygon' in position:
-                pts = np.array(position['polygon'], dtype=np.int32)
-                cv2.polylines(result_image, [pts], True, color, 1)
+            # Queue polygon if available
+            if n_poly:
+                method_polygons[method].append(polygons[start:offset])
                 
         except Exception as e:
             print(f"Error highlighting code {i}: {e}")
     
+    for method, pts in enumerate(method_polygons):
+        if pts:
+            cv2.polylines(result_image, pts, True, DETECTION_COLORS[method], 1)
+    
     return result_image
 
+# Shared HTTP session so /detect_url reuses pooled keep-alive connections;
+# sized to match the gunicorn worker threads that may download concurrently
+http_session = requests.Session()
+http_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+http_session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+
+# The session is shared by every caller, so never keep cookies from one
+# caller's download for the next
+http_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
 def download_image_from_url(url, timeout=30):
     """
     Download image from URL and return as OpenCV image
@@ -139,13 +409,8 @@ def download_image_from_url(url, timeout=30):
         if not parsed_url.scheme or not parsed_url.netloc:
             raise ValueError("Invalid URL format")
         
-        # Set headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Download the image
-        response = requests.get(url, headers=headers, timeout=timeout, stream=True)
+        # Download the image (the session sends browser-like headers)
+        response = http_session.get(url, timeout=timeout)
         response.raise_for_status()
         
         # Check if the response contains image data
@@ -167,6 +432,15 @@ def download_image_from_url(url, timeout=30):
     except Exception as e:
         raise ValueError(f"Error processing image from URL: {str(e)}")
 
+def fast_jsonify(payload):
+    """
+    Serialize a response with orjson, which also handles NumPy arrays natively
+    """
+    return app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -209,43 +483,48 @@ def detect_datamatrix_endpoint():
     if file.filename == '':
         return jsonify({'error': 'No image selected'}), 400
     
-    # Save the uploaded file
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
     
-    # Read the image
-    image = cv2.imread(filepath)
+    # Decode the uploaded image straight from memory
+    image = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
     if image is None:
         return jsonify({'error': 'Could not read image file'}), 400
     
     # Detect datamatrix codes
-    detected_codes = detect_datamatrix(image)
+    fast = request.args.get('fast', 'false').lower() == 'true'
+    detections = detect_datamatrix(image, fast)
     
     # Highlight the detected codes
-    result_image = highlight_codes(image, detected_codes)
-    
-    # Save the result image
-    output_filename = f"result_{filename}"
-    output_filepath = os.path.join(OUTPUT_FOLDER, output_filename)
-    cv2.imwrite(output_filepath, result_image)
+    result_image = highlight_codes(image, detections)
+    detected_codes = detections_to_json(detections)
     
     # Prepare response
     response = {
         'detected_codes': detected_codes,
-        'count': len(detected_codes),
-        'image_url': f"/download/{output_filename}"
+        'count': len(detected_codes)
     }
     
-    # Include image in response if requested
+    # Include image in response if requested, otherwise save it for download
+    write_future = None
     include_image = request.args.get('include_image', 'false').lower() == 'true'
     if include_image:
         # Convert image to base64
-        _, buffer = cv2.imencode('.jpg', result_image)
-        img_str = base64.b64encode(buffer).decode('utf-8')
+        img_str = base64.b64encode(encode_jpeg(result_image)).decode('utf-8')
         response['image'] = f"data:image/jpeg;base64,{img_str}"
+    else:
+        # Unique names keep another worker's cached copy from going stale
+        unique_id = str(uuid.uuid4())[:8]
+        output_filename = f"result_{unique_id}_{filename}"
+        write_future = io_pool.submit(save_result_image, output_filename, result_image)
+        response['image_url'] = f"/download/{output_filename}"
+    
+    json_response = fast_jsonify(response)
     
-    return jsonify(response)
+    # Make sure the result image is on disk before its URL is returned
+    if write_future is not None:
+        write_future.result()
+    
+    return json_response
 
 @app.route('/detect_base64', methods=['POST'])
 def detect_datamatrix_base64_endpoint():
@@ -272,33 +551,38 @@ def detect_datamatrix_base64_endpoint():
             return jsonify({'error': 'Could not decode image data'}), 400
         
         # Detect datamatrix codes
-        detected_codes = detect_datamatrix(image)
+        detections = detect_datamatrix(image, data.get('fast', False))
         
         # Highlight the detected codes
-        result_image = highlight_codes(image, detected_codes)
-        
-        # Generate a unique filename
-        import uuid
-        filename = f"{uuid.uuid4()}.jpg"
-        output_filepath = os.path.join(OUTPUT_FOLDER, filename)
-        cv2.imwrite(output_filepath, result_image)
+        result_image = highlight_codes(image, detections)
+        detected_codes = detections_to_json(detections)
         
         # Prepare response
         response = {
             'detected_codes': detected_codes,
-            'count': len(detected_codes),
-            'image_url': f"/download/{filename}"
+            'count': len(detected_codes)
         }
         
-        # Include image in response if requested
+        # Include image in response if requested, otherwise save it for download
+        write_future = None
         include_image = data.get('include_image', False)
         if include_image:
             # Convert image to base64
-            _, buffer = cv2.imencode('.jpg', result_image)
-            img_str = base64.b64encode(buffer).decode('utf-8')
+            img_str = base64.b64encode(encode_jpeg(result_image)).decode('utf-8')
             response['image'] = f"data:image/jpeg;base64,{img_str}"
+        else:
+            # Generate a unique filename
+            filename = f"{uuid.uuid4()}.jpg"
+            write_future = io_pool.submit(save_result_image, filename, result_image)
+            response['image_url'] = f"/download/{filename}"
         
-        return jsonify(response)
+        json_response = fast_jsonify(response)
+        
+        # Make sure the result image is on disk before its URL is returned
+        if write_future is not None:
+            write_future.result()
+        
+        return json_response
     
     except Exception as e:
         return jsonify({'error': f'Error processing image: {str(e)}'}), 500
@@ -322,40 +606,46 @@ def detect_datamatrix_url_endpoint():
         image = download_image_from_url(image_url)
         
         # Detect datamatrix codes
-        detected_codes = detect_datamatrix(image)
+        detections = detect_datamatrix(image, data.get('fast', False))
         
         # Highlight the detected codes
-        result_image = highlight_codes(image, detected_codes)
-        
-        # Generate a unique filename based on URL
-        parsed_url = urlparse(image_url)
-        original_filename = os.path.basename(parsed_url.path) or 'image'
-        if not original_filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
-            original_filename += '.jpg'
-        
-        # Create unique filename to avoid conflicts
-        unique_id = str(uuid.uuid4())[:8]
-        output_filename = f"result_{unique_id}_{original_filename}"
-        output_filepath = os.path.join(OUTPUT_FOLDER, output_filename)
-        cv2.imwrite(output_filepath, result_image)
+        result_image = highlight_codes(image, detections)
+        detected_codes = detections_to_json(detections)
         
         # Prepare response
         response = {
             'detected_codes': detected_codes,
             'count': len(detected_codes),
-            'image_url': f"/download/{output_filename}",
             'source_url': image_url
         }
         
-        # Include image in response if requested
+        # Include image in response if requested, otherwise save it for download
+        write_future = None
         include_image = data.get('include_image', False)
         if include_image:
             # Convert image to base64
-            _, buffer = cv2.imencode('.jpg', result_image)
-            img_str = base64.b64encode(buffer).decode('utf-8')
+            img_str = base64.b64encode(encode_jpeg(result_image)).decode('utf-8')
             response['image'] = f"data:image/jpeg;base64,{img_str}"
+        else:
+            # Generate a unique filename based on URL
+            parsed_url = urlparse(image_url)
+            original_filename = os.path.basename(parsed_url.path) or 'image'
+            if not original_filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
+                original_filename += '.jpg'
+            
+            # Create unique filename to avoid conflicts
+            unique_id = str(uuid.uuid4())[:8]
+            output_filename = f"result_{unique_id}_{original_filename}"
+            write_future = io_pool.submit(save_result_image, output_filename, result_image)
+            response['image_url'] = f"/download/{output_filename}"
         
-        return jsonify(response)
+        json_response = fast_jsonify(response)
+        
+        # Make sure the result image is on disk before its URL is returned
+        if write_future is not None:
+            write_future.result()
+        
+        return json_response
     
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -367,8 +657,16 @@ def download_file(filename):
     """
     Download processed image
     """
+    # Serve recently produced images straight from memory
+    with result_image_cache_lock:
+        jpeg_bytes = result_image_cache.get(filename)
+    if jpeg_bytes is not None:
+        return send_file(io.BytesIO(jpeg_bytes), mimetype='image/jpeg',
+                         as_attachment=True, download_name=filename)
+    
     return send_file(os.path.join(OUTPUT_FOLDER, filename), as_attachment=True)
 
 if __name__ == '__main__':
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Local development only; in production run under gunicorn:
+    # gunicorn -c gunicorn.conf.py 'app-simplified:app'
+    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -2,12 +2,16 @@ import cv2
 import numpy as np
 from pyzbar import pyzbar
 from pylibdmtx import pylibdmtx
-import matplotlib.pyplot as plt
 import base64
 import io
 import os
-import json
 import time
+import uuid
+import hashlib
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
 from flask import Flask, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 
@@ -24,47 +28,280 @@ OUTPUT_FOLDER = 'outputs'
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
-def detect_datamatrix_pyzbar(image):
+# Shared pool for running the decoders concurrently (both release the GIL
+# inside their native library calls)
+decode_pool = ThreadPoolExecutor(max_workers=4)
+
+# Pool for writing result images to disk while the JSON response is built
+io_pool = ThreadPoolExecutor(max_workers=4)
+
+# Prefer libjpeg-turbo via PyTurboJPEG for inline JPEG responses, falling back
+# to OpenCV when the library is not available
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    jpeg_encoder = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    jpeg_encoder = None
+
+JPEG_QUALITY = 85
+
+def encode_jpeg(image):
     """
-    Detect Data Matrix codes using pyzbar library
+    Encode a BGR image as JPEG bytes
     """
-    # Convert to RGB for pyzbar
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if jpeg_encoder is not None:
+        return jpeg_encoder.encode(image, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
     
-    # Detect barcodes/datamatrix codes
-    codes = pyzbar.decode(image_rgb)
+    _, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    return buffer
+
+# Recently produced result images kept as encoded JPEG bytes so /download can
+# serve them without touching the disk; bounded by total size in bytes. Each
+# gunicorn worker has its own cache, so every result must get a unique filename
+# that is never rewritten
+RESULT_IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+result_image_cache = LRUCache(maxsize=RESULT_IMAGE_CACHE_BYTES, getsizeof=len)
+result_image_cache_lock = threading.Lock()
+
+def save_result_image(filename, image):
+    """
+    Encode a result image once, keep it in memory for downloads and write it to disk
+    """
+    filepath = os.path.join(OUTPUT_FOLDER, filename)
+    
+    # Other formats keep OpenCV's extension-based encoding and are served from disk
+    if not filename.lower().endswith(('.jpg', '.jpeg')):
+        cv2.imwrite(filepath, image)
+        return
+    
+    jpeg_bytes = bytes(encode_jpeg(image))
+    with result_image_cache_lock:
+        result_image_cache[filename] = jpeg_bytes
+    
+    with open(filepath, 'wb') as f:
+        f.write(jpeg_bytes)
+
+# Cache of decode results keyed by a hash of the grayscale pixels, so repeated
+# uploads of the same image skip decoding entirely
+DECODE_CACHE_SIZE = 1024
+decode_cache = LRUCache(maxsize=DECODE_CACHE_SIZE)
+decode_cache_lock = threading.Lock()
+
+def image_cache_key(gray):
+    """
+    Hash the image dimensions and pixels into a compact cache key
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(gray.shape).encode())
+    digest.update(np.ascontiguousarray(gray))
+    return digest.digest()
+
+# Per-thread scratch buffers reused across requests to avoid reallocating
+# full-size images every time
+scratch = threading.local()
+
+def scratch_buffer(name, shape):
+    """
+    Return this thread's uint8 buffer for name, reallocating only when the shape changes
+    """
+    buffer = getattr(scratch, name, None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        setattr(scratch, name, buffer)
+    return buffer
+
+# Longest image edge passed to pylibdmtx; its region search grows
+# super-linearly with image area
+PYLIBDMTX_MAX_DIMENSION = 1600
+
+# Huge scans whose downscaled decode finds nothing are retried at full
+# resolution in overlapping tiles decoded in parallel
+TILED_DECODE_MIN_DIMENSION = 2000
+TILE_SIZE = 1024
+TILE_OVERLAP = 128
+
+# Tiles of one image are decoded by a short-lived pool of at most this many
+# threads owned by the request, so a large image never queues behind (or
+# ahead of) another request's tiles. The worst case is workers x threads x
+# TILE_FANOUT pylibdmtx threads, only while requests hit this fallback
+TILE_FANOUT = int(os.environ.get('TILE_FANOUT', 4))
+
+def tile_offsets(length, tile, overlap):
+    """
+    Start offsets of overlapping windows covering [0, length)
+    """
+    if length <= tile:
+        return [0]
+    stride = tile - overlap
+    offsets = list(range(0, length - tile, stride))
+    offsets.append(length - tile)
+    return offsets
+
+def rect_iou(a, b):
+    """
+    Intersection over union of two (left, top, width, height) rects
+    """
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+def decode_pylibdmtx_tiled(gray, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Decode overlapping tiles with pylibdmtx in parallel and merge the
+    results into full-image coordinates
+    """
+    h, w = gray.shape[:2]
+    tiles = [
+        (x0, y0, gray[y0:y0 + tile, x0:x0 + tile])
+        for y0 in tile_offsets(h, tile, overlap)
+        for x0 in tile_offsets(w, tile, overlap)
+    ]
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(TILE_FANOUT, len(tiles)))) as tile_pool:
+        tile_codes = list(tile_pool.map(pylibdmtx.decode, [tile_img for _, _, tile_img in tiles]))
+    
+    merged = []
+    for (x0, y0, tile_img), codes in zip(tiles, tile_codes):
+        tile_h = tile_img.shape[0]
+        for code in codes:
+            left, top, width, height = code.rect
+            # pylibdmtx measures rect.top from the bottom edge of the image
+            rect = type(code.rect)(left + x0, top + (h - y0 - tile_h), width, height)
+            
+            # Codes in the overlap band are found by more than one tile
+            if any(other.data == code.data and rect_iou(other.rect, rect) > 0.5 for other in merged):
+                continue
+            merged.append(code._replace(rect=rect))
+    
+    return merged
+
+def decode_pylibdmtx_downscaled(gray):
+    """
+    Run pylibdmtx on a downscaled copy of large images and map the
+    returned rects back to full-resolution coordinates
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, PYLIBDMTX_MAX_DIMENSION / max(h, w))
+    if scale >= 1.0:
+        return pylibdmtx.decode(gray)
+    
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    codes = pylibdmtx.decode(small)
+    
+    # Small codes may not survive downscaling on huge scans
+    if not codes and max(h, w) > TILED_DECODE_MIN_DIMENSION:
+        return decode_pylibdmtx_tiled(gray)
+    
+    # Scale rect coordinates back to the original image
+    return [
+        code._replace(rect=type(code.rect)(*(int(round(v / scale)) for v in code.rect)))
+        for code in codes
+    ]
+
+# pylibdmtx is skipped when pyzbar's results cover at least this fraction of
+# the image. zbar cannot decode Data Matrix, so this is purely a coverage
+# heuristic: a single QR code or barcode this large hides any Data Matrix
+# codes elsewhere in the frame, which is why the skip only applies with fast
+PYZBAR_COVERAGE_SKIP_RATIO = 0.5
+
+def pyzbar_covers_image(codes, shape):
+    """
+    Check whether pyzbar results make a pylibdmtx pass unnecessary
+    """
+    if not codes:
+        return False
+    
+    # Union area of the pyzbar bounding boxes
+    mask = np.zeros(shape[:2], dtype=bool)
+    for code in codes:
+        left, top, width, height = code.rect
+        mask[max(top, 0):top + height, max(left, 0):left + width] = True
+    return mask.mean() >= PYZBAR_COVERAGE_SKIP_RATIO
+
+def polygon_to_array(polygon):
+    """
+    Convert pyzbar polygon points to an (N, 2) int32 array in a single allocation
+    """
+    return np.fromiter(
+        (v for p in polygon for v in (p.x, p.y)), dtype=np.int32, count=2 * len(polygon)
+    ).reshape(-1, 2)
+
+def detect_datamatrix_pyzbar(gray):
+    """
+    Detect Data Matrix codes using pyzbar library
+    """
+    # pyzbar decodes single-channel images directly
+    codes = pyzbar.decode(gray)
     
     return codes
 
-def detect_datamatrix_pylibdmtx(image):
+def detect_datamatrix_pylibdmtx(gray):
     """
     Detect Data Matrix codes using pylibdmtx library (more specialized for Data Matrix)
     """
-    # Convert to grayscale for better detection
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
     # Detect Data Matrix codes
-    codes = pylibdmtx.decode(gray)
+    codes = decode_pylibdmtx_downscaled(gray)
     
     return codes
 
-def highlight_codes(image, codes, method='pyzbar', color=(0, 255, 0), thickness=3):
+def detect_datamatrix_both(gray, fast=False):
+    """
+    Run pyzbar and pylibdmtx on a grayscale image, reusing cached results for
+    images that were already decoded. Only when fast is set is pylibdmtx
+    skipped because pyzbar's results already cover the image.
+    """
+    key = (image_cache_key(gray), fast)
+    with decode_cache_lock:
+        method_codes = decode_cache.get(key)
+    if method_codes is not None:
+        return method_codes
+    
+    if fast:
+        # Run pyzbar first and only fall back to pylibdmtx when its results
+        # leave most of the image uncovered
+        pyzbar_codes = detect_datamatrix_pyzbar(gray)
+        method_codes = {
+            'pyzbar': pyzbar_codes,
+            'pylibdmtx': [] if pyzbar_covers_image(pyzbar_codes, gray.shape) else detect_datamatrix_pylibdmtx(gray)
+        }
+    else:
+        # Run both decoders in parallel
+        pyzbar_future = decode_pool.submit(detect_datamatrix_pyzbar, gray)
+        pylibdmtx_future = decode_pool.submit(detect_datamatrix_pylibdmtx, gray)
+        method_codes = {
+            'pyzbar': pyzbar_future.result(),
+            'pylibdmtx': pylibdmtx_future.result()
+        }
+    
+    with decode_cache_lock:
+        decode_cache[key] = method_codes
+    
+    return method_codes
+
+# Label text height for the fixed font, scale and thickness used by
+# highlight_codes; Hershey glyph heights do not depend on the string
+CHAR_H = cv2.getTextSize("M", cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0][1]
+
+def highlight_codes(image, codes, method='pyzbar', color=(0, 255, 0), thickness=3, in_place=False):
     """
-    Draw rectangles around detected codes with proper coordinate handling
+    Draw rectangles around detected codes with proper coordinate handling,
+    directly on the input image when in_place is set
     """
-    result_image = image.copy()
+    result_image = image if in_place else image.copy()
     
     if method == 'pyzbar':
+        # Polygons are collected and drawn with a single polylines call
+        polygons = []
+        
         for i, code in enumerate(codes):
             try:
                 # Get the bounding box points
                 points = code.polygon
                 if len(points) == 4:
                     # Convert to numpy array with proper integer conversion
-                    pts = np.array([[int(point.x), int(point.y)] for point in points], dtype=np.int32)
-                    
-                    # Draw polygon around the detected area
-                    cv2.polylines(result_image, [pts], True, color, thickness)
+                    polygons.append(polygon_to_array(points))
                     
                     # Also draw a bounding rectangle for clarity
                     rect = code.rect
@@ -73,10 +310,9 @@ def highlight_codes(image, codes, method='pyzbar', color=(0, 255, 0), thickness=
                     
                     # Add text label with better positioning
                     text = f"DM{i+1}: {code.data.decode('utf-8')}"
-                    text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
                     
                     # Position text above the code, but check if there's space
-                    text_y = max(y - 10, text_size[1] + 5)
+                    text_y = max(y - 10, CHAR_H + 5)
                     cv2.putText(result_image, text, (x, text_y), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
                                
@@ -93,6 +329,10 @@ def highlight_codes(image, codes, method='pyzbar', color=(0, 255, 0), thickness=
             except Exception as e:
                 print(f"Error highlighting code {i}: {e}")
                 continue
+        
+        # Draw the polygons around the detected areas
+        if polygons:
+            cv2.polylines(result_image, polygons, True, color, thickness)
     
     elif method == 'pylibdmtx':
         for i, code in enumerate(codes):
@@ -119,26 +359,81 @@ def highlight_codes(image, codes, method='pyzbar', color=(0, 255, 0), thickness=
     
     return result_image
 
-def enhance_image_for_detection(image):
+# CLAHE objects reused across calls, keyed by (clipLimit, tileGridSize). They
+# keep mutable internal buffers and are not thread-safe, so each thread gets
+# its own
+_CLAHE_CACHE = threading.local()
+
+def get_clahe(clip_limit=2.0, tile_grid_size=(4, 4)):
     """
-    Preprocess image to improve detection accuracy
+    Return this thread's cached CLAHE object for the given parameters
     """
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    cache = getattr(_CLAHE_CACHE, 'objects', None)
+    if cache is None:
+        cache = _CLAHE_CACHE.objects = {}
+    
+    key = (clip_limit, tile_grid_size)
+    clahe = cache.get(key)
+    if clahe is None:
+        clahe = cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+    return clahe
+
+# Images whose luminance standard deviation exceeds this already have enough
+# contrast; CLAHE and the blur would only cost time and soften the modules
+ENHANCE_MAX_CONTRAST_STD = 45
+
+def enhance_image_for_detection(gray):
+    """
+    Preprocess a grayscale image to improve detection accuracy, returning it
+    untouched when its contrast is already high
+    """
+    if float(gray.std()) > ENHANCE_MAX_CONTRAST_STD:
+        return gray
     
     # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    clahe = get_clahe(2.0, (4, 4))
     enhanced = clahe.apply(gray)
     
-    # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(enhanced, (3, 3), 0)
+    # Apply a 3x3 box blur to reduce noise; the result stays single-channel
+    # since both decoders consume grayscale directly
+    blurred = cv2.blur(enhanced, (3, 3))
     
-    # Convert back to BGR for consistent processing
-    enhanced_bgr = cv2.cvtColor(blurred, cv2.COLOR_GRAY2BGR)
+    return blurred
+
+def extract_detected_codes(codes, method, label):
+    """
+    Build the JSON description of the codes found by one detection method
+    """
+    detected_codes = []
+    for j, code in enumerate(codes):
+        try:
+            x, y, w, h = (int(v) for v in code.rect)
+            data = code.data.decode('utf-8')
+            code_type = code.type if hasattr(code, 'type') else 'DATAMATRIX'
+            
+            # Get position information
+            position = {
+                'x': x,
+                'y': y,
+                'width': w,
+                'height': h
+            }
+            if method == 'pyzbar' and code.polygon:
+                position['polygon'] = polygon_to_array(code.polygon)
+            
+            detected_codes.append({
+                'method': label,
+                'data': data,
+                'type': code_type,
+                'position': position
+            })
+            
+        except Exception as e:
+            print(f"Error processing code {j+1}: {e}")
     
-    return enhanced_bgr
+    return detected_codes
 
-def process_image(image):
+def process_image(image, fast=False):
     """
     Process image and detect Data Matrix codes
     """
@@ -149,111 +444,50 @@ def process_image(image):
     methods = ['pyzbar', 'pylibdmtx']
     colors = [(0, 255, 0), (255, 0, 0)]
     
+    # Convert to grayscale once and share it between both decoders
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=scratch_buffer('gray', image.shape[:2]))
+    
+    # Run the decoders
+    method_codes = detect_datamatrix_both(gray, fast)
+    
     for i, method in enumerate(methods):
-        if method == 'pyzbar':
-            codes = detect_datamatrix_pyzbar(image)
-        else:
-            codes = detect_datamatrix_pylibdmtx(image)
+        codes = method_codes[method]
         
         if codes:
             # Extract code data
-            for j, code in enumerate(codes):
-                try:
-                    data = code.data.decode('utf-8')
-                    code_type = code.type if hasattr(code, 'type') else 'DATAMATRIX'
-                    
-                    # Get position information
-                    if method == 'pyzbar':
-                        rect = code.rect
-                        position = {
-                            'x': int(rect.left),
-                            'y': int(rect.top),
-                            'width': int(rect.width),
-                            'height': int(rect.height)
-                        }
-                        if hasattr(code, 'polygon') and code.polygon:
-                            polygon = [(int(p.x), int(p.y)) for p in code.polygon]
-                            position['polygon'] = polygon
-                    elif method == 'pylibdmtx':
-                        if hasattr(code, 'rect'):
-                            left, top, width, height = code.rect
-                            position = {
-                                'x': int(left),
-                                'y': int(top),
-                                'width': int(width),
-                                'height': int(height)
-                            }
-                        else:
-                            position = None
-                    
-                    detected_codes.append({
-                        'method': method,
-                        'data': data,
-                        'type': code_type,
-                        'position': position
-                    })
-                    
-                except Exception as e:
-                    print(f"Error processing code {j+1}: {e}")
+            detected_codes.extend(extract_detected_codes(codes, method, method))
             
-            # Highlight the codes
+            # Highlight the codes; the last method can draw on the input
+            # itself since nothing reads it afterwards
             color = colors[i % len(colors)]
-            highlighted_image = highlight_codes(image, codes, method, color)
+            highlighted_image = highlight_codes(image, codes, method, color, in_place=i == len(methods) - 1)
             all_results.append((method, highlighted_image, codes))
     
     # If no codes found, try with enhanced image
     if not all_results:
-        enhanced_image = enhance_image_for_detection(image)
+        enhanced_gray = enhance_image_for_detection(gray)
+        
+        # Nothing new to scan when the image was left untouched
+        if enhanced_gray is gray:
+            method_codes = {}
+        else:
+            method_codes = detect_datamatrix_both(enhanced_gray, fast)
+        
+        # Only expand to BGR when there is something to highlight
+        enhanced_image = None
         
         for i, method in enumerate(methods):
-            if method == 'pyzbar':
-                codes = detect_datamatrix_pyzbar(enhanced_image)
-            else:
-                codes = detect_datamatrix_pylibdmtx(enhanced_image)
+            codes = method_codes.get(method)
             
             if codes:
                 # Extract code data
-                for j, code in enumerate(codes):
-                    try:
-                        data = code.data.decode('utf-8')
-                        code_type = code.type if hasattr(code, 'type') else 'DATAMATRIX'
-                        
-                        # Get position information
-                        if method == 'pyzbar':
-                            rect = code.rect
-                            position = {
-                                'x': int(rect.left),
-                                'y': int(rect.top),
-                                'width': int(rect.width),
-                                'height': int(rect.height)
-                            }
-                            if hasattr(code, 'polygon') and code.polygon:
-                                polygon = [(int(p.x), int(p.y)) for p in code.polygon]
-                                position['polygon'] = polygon
-                        elif method == 'pylibdmtx':
-                            if hasattr(code, 'rect'):
-                                left, top, width, height = code.rect
-                                position = {
-                                    'x': int(left),
-                                    'y': int(top),
-                                    'width': int(width),
-                                    'height': int(height)
-                                }
-                            else:
-                                position = None
-                        
-                        detected_codes.append({
-                            'method': method + '_enhanced',
-                            'data': data,
-                            'type': code_type,
-                            'position': position
-                        })
-                        
-                    except Exception as e:
-                        print(f"Error processing code {j+1}: {e}")
+                detected_codes.extend(extract_detected_codes(codes, method, method + '_enhanced'))
+                
+                if enhanced_image is None:
+                    enhanced_image = cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR)
                 
                 color = colors[i % len(colors)]
-                highlighted_image = highlight_codes(enhanced_image, codes, method, color)
+                highlighted_image = highlight_codes(enhanced_image, codes, method, color, in_place=i == len(methods) - 1)
                 all_results.append((f"{method}_enhanced", highlighted_image, codes))
     
     # Prepare result image
@@ -271,6 +505,15 @@ def process_image(image):
     
     return result_image, detected_codes
 
+def fast_jsonify(payload):
+    """
+    Serialize a response with orjson, which also handles NumPy arrays natively
+    """
+    return app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -312,23 +555,16 @@ def detect_datamatrix():
     if file.filename == '':
         return jsonify({'error': 'No image selected'}), 400
     
-    # Save the uploaded file
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
     
-    # Read the image
-    image = cv2.imread(filepath)
+    # Decode the uploaded image straight from memory
+    image = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
     if image is None:
         return jsonify({'error': 'Could not read image file'}), 400
     
     # Process the image
-    result_image, detected_codes = process_image(image)
-    
-    # Save the result image
-    output_filename = f"result_{filename}"
-    output_filepath = os.path.join(OUTPUT_FOLDER, output_filename)
-    cv2.imwrite(output_filepath, result_image)
+    fast = request.args.get('fast', 'false').lower() == 'true'
+    result_image, detected_codes = process_image(image, fast)
     
     # Prepare response
     response = {
@@ -337,17 +573,27 @@ def detect_datamatrix():
     }
     
     # Check if client wants the image in the response
+    write_future = None
     include_image = request.args.get('include_image', 'false').lower() == 'true'
     if include_image:
         # Convert image to base64
-        _, buffer = cv2.imencode('.jpg', result_image)
-        img_str = base64.b64encode(buffer).decode('utf-8')
+        img_str = base64.b64encode(encode_jpeg(result_image)).decode('utf-8')
         response['image'] = f"data:image/jpeg;base64,{img_str}"
     else:
-        # Provide URL to download the image
+        # Save the result image under a unique filename and provide URL to
+        # download it; reused names would let another worker's cached copy go stale
+        unique_id = str(uuid.uuid4())[:8]
+        output_filename = f"result_{unique_id}_{filename}"
+        write_future = io_pool.submit(save_result_image, output_filename, result_image)
         response['image_url'] = f"/download/{output_filename}"
     
-    return jsonify(response)
+    json_response = fast_jsonify(response)
+    
+    # Make sure the result image is on disk before its URL is returned
+    if write_future is not None:
+        write_future.result()
+    
+    return json_response
 
 @app.route('/detect_base64', methods=['POST'])
 def detect_datamatrix_base64():
@@ -374,13 +620,7 @@ def detect_datamatrix_base64():
             return jsonify({'error': 'Could not decode image data'}), 400
         
         # Process the image
-        result_image, detected_codes = process_image(image)
-        
-        # Generate a unique filename
-        import uuid
-        filename = f"{uuid.uuid4()}.jpg"
-        output_filepath = os.path.join(OUTPUT_FOLDER, filename)
-        cv2.imwrite(output_filepath, result_image)
+        result_image, detected_codes = process_image(image, data.get('fast', False))
         
         # Prepare response
         response = {
@@ -389,17 +629,25 @@ def detect_datamatrix_base64():
         }
         
         # Check if client wants the image in the response
+        write_future = None
         include_image = data.get('include_image', False)
         if include_image:
             # Convert image to base64
-            _, buffer = cv2.imencode('.jpg', result_image)
-            img_str = base64.b64encode(buffer).decode('utf-8')
+            img_str = base64.b64encode(encode_jpeg(result_image)).decode('utf-8')
             response['image'] = f"data:image/jpeg;base64,{img_str}"
         else:
-            # Provide URL to download the image
+            # Save the result image under a unique filename and provide URL to download it
+            filename = f"{uuid.uuid4()}.jpg"
+            write_future = io_pool.submit(save_result_image, filename, result_image)
             response['image_url'] = f"/download/{filename}"
         
-        return jsonify(response)
+        json_response = fast_jsonify(response)
+        
+        # Make sure the result image is on disk before its URL is returned
+        if write_future is not None:
+            write_future.result()
+        
+        return json_response
     
     except Exception as e:
         return jsonify({'error': f'Error processing image: {str(e)}'}), 500
@@ -409,11 +657,19 @@ def download_file(filename):
     """
     Download processed image
     """
+    # Serve recently produced images straight from memory
+    with result_image_cache_lock:
+        jpeg_bytes = result_image_cache.get(filename)
+    if jpeg_bytes is not None:
+        return send_file(io.BytesIO(jpeg_bytes), mimetype='image/jpeg',
+                         as_attachment=True, download_name=filename)
+    
     return send_file(os.path.join(OUTPUT_FOLDER, filename), as_attachment=True)
 
 if __name__ == '__main__':
     # Install required packages if not already installed:
-    # pip install flask opencv-python pyzbar pylibdmtx matplotlib numpy
+    # pip install flask opencv-python pyzbar pylibdmtx numpy
     
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Local development only; in production run under gunicorn:
+    # gunicorn -c gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+
+# Gunicorn configuration for the Data Matrix detection service
+bind = '0.0.0.0:5001'
+
+# One worker process per CPU this container may actually use (like nproc,
+# honouring affinity and cpusets), unless WEB_CONCURRENCY overrides it
+if hasattr(os, 'sched_getaffinity'):
+    available_cpus = len(os.sched_getaffinity(0))
+else:
+    available_cpus = os.cpu_count() or 1
+workers = int(os.environ.get('WEB_CONCURRENCY', available_cpus))
+
+# Threaded workers: detection is CPU-heavy but pyzbar/pylibdmtx release the
+# GIL, so each process can serve several detections concurrently
+worker_class = 'gthread'
+threads = 4
+
+# Large images can take a while to decode
+timeout = 120
@@ -1,9 +1,14 @@
 import requests
-import base64
 import json
 import sys
 import os
 
+# pybase64 is a SIMD drop-in for the stdlib base64 module
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 def test_file_upload(image_path):
     """Test the /detect endpoint with file upload"""
     print(f"Testing file upload with {image_path}")
@@ -15,11 +20,10 @@ def test_file_upload(image_path):
         print(f"Error: File {image_path} does not exist")
         return
     
-    # Prepare the file for upload
-    files = {'image': open(image_path, 'rb')}
-    
-    # Make the request
-    response = requests.post(url, files=files)
+    # Upload the file, making sure it is closed afterwards
+    with open(image_path, 'rb') as image_file:
+        files = {'image': (os.path.basename(image_path), image_file, 'image/jpeg')}
+        response = requests.post(url, files=files)
     
     # Print the response
     if response.status_code == 200:
@@ -39,7 +43,7 @@ def test_file_upload(image_path):
         print(f"Error: {response.status_code}")
         print(response.text)
 
-def test_base64_upload(image_path):
+def test_base64_upload(image_path, include_image=False):
     """Test the /detect_base64 endpoint with base64 encoded image"""
     print(f"Testing base64 upload with {image_path}")
     
@@ -52,17 +56,19 @@ def test_base64_upload(image_path):
     
     # Read the image and encode it as base64
     with open(image_path, 'rb') as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+        encoded = base64.b64encode(image_file.read())
     
-    # Prepare the JSON payload
-    payload = {
-        'image': encoded_string,
-        'include_image': True  # Include the processed image in the response
+    # Prepare the JSON payload; base64 output needs no JSON escaping, so the
+    # encoded bytes are spliced in directly instead of being copied into a
+    # str and again through json.dumps
+    options = {
+        'include_image': include_image  # Include the processed image in the response
     }
+    body = b''.join((b'{"image": "', encoded, b'", ', json.dumps(options)[1:].encode('utf-8')))
     
     # Make the request
     headers = {'Content-Type': 'application/json'}
-    response = requests.post(url, data=json.dumps(payload), headers=headers)
+    response = requests.post(url, data=body, headers=headers)
     
     # Print the response
     if response.status_code == 200:
@@ -94,14 +100,18 @@ def test_base64_upload(image_path):
         print(response.text)
 
 if __name__ == "__main__":
+    # Only ask for the processed image back when --include-image is passed
+    args = [arg for arg in sys.argv[1:] if arg != '--include-image']
+    include_image = len(args) < len(sys.argv) - 1
+    
     # Check if image path is provided
-    if len(sys.argv) < 2:
-        print("Usage: python test_client.py <image_path>")
+    if not args:
+        print("Usage: python test_client.py <image_path> [--include-image]")
         sys.exit(1)
     
-    image_path = sys.argv[1]
+    image_path = args[0]
     
     # Test both endpoints
     test_file_upload(image_path)
     print("\n" + "-"*50 + "\n")
-    test_base64_upload(image_path)
\ No newline at end of file
+    test_base64_upload(image_path, include_image)
\ No newline at end of file